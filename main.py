@@ -1,21 +1,50 @@
 #!/usr/bin/env python3
 
 from fastapi import FastAPI, HTTPException, Query
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi.responses import Response
+from starlette.requests import Request
+from starlette.types import Message, Scope
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Literal, Optional
+import anyio
+import asyncio
 import uvicorn
 import argparse
+import functools
+from datetime import datetime, timezone
+import logging
+import orjson
 import os
 import sys
 
 # Add project root to path to allow imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from mt5_bridge.mt5_handler import MT5Handler
+from mt5_bridge.mt5_handler import DEFAULT_TICK_MAX_STALE_MS, MT5Handler
+
+# Configure logging for the service (mt5_handler only creates its logger) /
+# サービス全体のログ設定（mt5_handlerはロガーを生成するのみ）
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="MT5 Bridge API")
 mt5_handler = MT5Handler()
 
+# Worker threads available for blocking MT5 calls (Starlette default is 40) /
+# MT5のブロッキング呼び出しに使うスレッド数（Starletteの既定値は40）
+THREADPOOL_LIMIT = 200
+
+# Maximum number of sub-requests accepted by /batch / /batchで受け付けるサブリクエストの上限
+MAX_BATCH_REQUESTS = 20
+
+# Maximum number of symbols accepted by GET /rates / GET /ratesで受け付けるシンボル数の上限
+MAX_RATES_SYMBOLS = 20
+
+# Latest UNIX timestamp accepted by /rates/{symbol}/range (3000-01-01 UTC), within what
+# datetime.fromtimestamp handles on Windows /
+# /rates/{symbol}/rangeで受け付けるUNIX時刻の上限（3000-01-01 UTC、Windowsのdatetime.fromtimestampで扱える範囲内）
+MAX_RANGE_TIMESTAMP = 32_503_680_000
+
 class Rate(BaseModel):
     time: int
     open: float
@@ -26,6 +55,16 @@ class Rate(BaseModel):
     spread: int
     real_volume: int
 
+class RatesColumnar(BaseModel):
+    time: List[int]
+    open: List[float]
+    high: List[float]
+    low: List[float]
+    close: List[float]
+    tick_volume: List[int]
+    spread: List[int]
+    real_volume: List[int]
+
 class Tick(BaseModel):
     time: int
     bid: float
@@ -50,53 +89,138 @@ class Position(BaseModel):
 @app.on_event("startup")
 async def startup_event():
     """Initialize MT5 connection on startup."""
+    # Raise the worker thread cap so bursts are not queued behind 40 threads /
+    # バースト時に40スレッドで詰まらないようスレッド上限を引き上げ
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_LIMIT
     if not mt5_handler.initialize():
-        print("WARNING: Failed to initialize MT5 on startup. Will retry on first request.")
+        print("WARNING: Failed to initialize MT5 on startup. Will retry in the background.")
+    # Keep the connection alive and reconnect off the request path /
+    # リクエスト処理の外で接続を維持・再接続する
+    mt5_handler.start_heartbeat()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Shutdown MT5 connection."""
-    mt5_handler.shutdown()
+    # Joining the heartbeat blocks, so keep it off the event loop / ハートビートのjoinはブロックするためイベントループ外で実行
+    await anyio.to_thread.run_sync(mt5_handler.shutdown)
+
+# Pre-encoded /health bodies; only the connection flag varies / 事前エンコード済みの/health応答（接続フラグのみ変化）
+_HEALTH_CONNECTED = b'{"status":"ok","mt5_connected":true}'
+_HEALTH_DISCONNECTED = b'{"status":"ok","mt5_connected":false}'
+
+async def health_check(request: Request) -> Response:
+    # Plain Starlette route: no dependency resolution or response-model encoding for liveness probes /
+    # 素のStarletteルートとして、死活監視で依存解決やレスポンスモデル処理を行わない
+    body = _HEALTH_CONNECTED if mt5_handler.connected else _HEALTH_DISCONNECTED
+    return Response(content=body, media_type="application/json")
+
+app.add_route("/health", health_check, methods=["GET"])
+
+def _json_response(content: Any) -> Response:
+    # Encode with orjson (C encoder) and bypass response-model validation of trusted MT5 data /
+    # orjson(C実装)でエンコードし、信頼できるMT5データのレスポンスモデル検証を省略
+    return Response(content=orjson.dumps(content), media_type="application/json")
 
-@app.get("/health")
-def health_check():
-    return {"status": "ok", "mt5_connected": mt5_handler.connected}
+@app.get("/rates", response_model=Dict[str, Optional[List[Rate]]])
+async def get_rates_multi(
+    symbols: List[str] = Query(..., max_length=MAX_RATES_SYMBOLS, description="Symbols to fetch (repeat the parameter per symbol)"),
+    timeframe: str = Query(..., description="Timeframe (e.g., M1, H1)"),
+    count: int = Query(1000, description="Number of bars per symbol")
+):
+    rates = await anyio.to_thread.run_sync(functools.partial(mt5_handler.get_rates_multi, symbols, timeframe, count))
+    if rates is None:
+        raise HTTPException(status_code=500, detail=f"Invalid timeframe: {timeframe}")
+    # Per-symbol failures are reported as null instead of failing the whole request /
+    # シンボル単位の失敗はリクエスト全体を失敗させずnullで返す
+    return _json_response(rates)
 
 @app.get("/rates/{symbol}", response_model=List[Rate])
-def get_rates(
+async def get_rates(
     symbol: str, 
     timeframe: str = Query(..., description="Timeframe (e.g., M1, H1)"), 
     count: int = Query(1000, description="Number of bars")
 ):
-    rates = mt5_handler.get_rates(symbol, timeframe, count)
+    # Run the blocking MT5 IPC call in a worker thread / ブロッキングするMT5呼び出しはワーカースレッドで実行
+    rates = await anyio.to_thread.run_sync(functools.partial(mt5_handler.get_rates, symbol, timeframe, count))
+    if rates is None:
+        raise HTTPException(status_code=500, detail=f"Failed to get rates for {symbol}")
+    # Return the handler output as-is; response_model stays for the OpenAPI schema only /
+    # Responseを直接返してPydanticの再検証を省略（response_modelはOpenAPIスキーマ用に残す）
+    return _json_response(rates)
+
+@app.get("/rates/{symbol}/columns", response_model=RatesColumnar)
+async def get_rates_columnar(
+    symbol: str,
+    timeframe: str = Query(..., description="Timeframe (e.g., M1, H1)"),
+    count: int = Query(1000, description="Number of bars")
+):
+    body = await anyio.to_thread.run_sync(functools.partial(mt5_handler.get_rates_columnar_json, symbol, timeframe, count))
+    if body is None:
+        raise HTTPException(status_code=500, detail=f"Failed to get rates for {symbol}")
+    # Column-oriented payload avoids repeating field names per bar; the handler already encoded it /
+    # 列指向にしてバーごとのキー名の重複を避ける（エンコードはハンドラ側で完了済み）
+    return Response(content=body, media_type="application/json")
+
+@app.get("/rates/{symbol}/range", response_model=List[Rate])
+async def get_rates_range(
+    symbol: str,
+    timeframe: str = Query(..., description="Timeframe (e.g., M1, H1)"),
+    start: int = Query(..., ge=0, le=MAX_RANGE_TIMESTAMP, description="Window start as a UNIX timestamp (UTC seconds)"),
+    end: int = Query(..., ge=0, le=MAX_RANGE_TIMESTAMP, description="Window end as a UNIX timestamp (UTC seconds), inclusive")
+):
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be earlier than end")
+    rates = await anyio.to_thread.run_sync(functools.partial(
+        mt5_handler.get_rates_range,
+        symbol,
+        timeframe,
+        datetime.fromtimestamp(start, tz=timezone.utc),
+        datetime.fromtimestamp(end, tz=timezone.utc),
+    ))
     if rates is None:
         raise HTTPException(status_code=500, detail=f"Failed to get rates for {symbol}")
-    return rates
+    return _json_response(rates)
 
 @app.get("/tick/{symbol}", response_model=Tick)
-def get_tick(symbol: str):
-    tick = mt5_handler.get_tick(symbol)
+async def get_tick(
+    symbol: str,
+    max_stale_ms: float = Query(DEFAULT_TICK_MAX_STALE_MS, ge=0, description="Maximum age of a cached tick in ms (0 = always fetch)")
+):
+    tick = await anyio.to_thread.run_sync(mt5_handler.get_tick, symbol, max_stale_ms)
     if tick is None:
         raise HTTPException(status_code=500, detail=f"Failed to get tick for {symbol}")
-    return tick
+    # Skip Pydantic validation of trusted MT5 data / 信頼できるMT5データの検証を省略
+    return _json_response(tick._asdict())
 
 @app.get("/positions", response_model=List[Position])
-def get_positions():
-    positions = mt5_handler.get_positions()
+async def get_positions():
+    positions = await anyio.to_thread.run_sync(mt5_handler.get_positions)
     if positions is None:
         raise HTTPException(status_code=500, detail="Failed to get positions")
-    return positions
+    # Skip per-item Pydantic validation of trusted MT5 data / 信頼できるMT5データの要素ごとの検証を省略
+    return _json_response(positions)
 
 class OrderRequest(BaseModel):
     symbol: str
-    type: str # "BUY" or "SELL"
+    type: Literal["BUY", "SELL"]
     volume: float
     sl: float = 0.0
     tp: float = 0.0
     comment: str = ""
+    # Maximum age of the cached tick used for pricing, in ms (0 = always fetch) /
+    # 価格決定に使うキャッシュ済みティックの最大経過時間（ミリ秒、0は常に取得）
+    max_stale_ms: float = Field(DEFAULT_TICK_MAX_STALE_MS, ge=0)
 
 class CloseRequest(BaseModel):
     ticket: int
+    # Optional position details from /positions; all three skip the lookup /
+    # /positionsで得たポジション情報（3つとも指定すると問い合わせを省略）
+    symbol: Optional[str] = None
+    volume: Optional[float] = None
+    type: Optional[Literal["BUY", "SELL"]] = None
+    # Maximum age of the cached tick used for pricing, in ms (0 = always fetch) /
+    # 価格決定に使うキャッシュ済みティックの最大経過時間（ミリ秒、0は常に取得）
+    max_stale_ms: float = Field(DEFAULT_TICK_MAX_STALE_MS, ge=0)
 
 class ModifyRequest(BaseModel):
     ticket: int
@@ -106,40 +230,135 @@ class ModifyRequest(BaseModel):
     update_tp: bool = False
 
 @app.post("/order")
-def send_order(order: OrderRequest):
-    ticket, error = mt5_handler.send_order(
-        order.symbol, 
-        order.type, 
-        order.volume, 
-        order.sl, 
-        order.tp, 
-        order.comment
-    )
+async def send_order(order: OrderRequest):
+    ticket, error = await anyio.to_thread.run_sync(functools.partial(
+        mt5_handler.send_order,
+        order.symbol,
+        order.type,
+        order.volume,
+        order.sl,
+        order.tp,
+        order.comment,
+        order.max_stale_ms,
+    ))
     if ticket is None:
         detail = error or "Failed to send order"
         raise HTTPException(status_code=500, detail=detail)
     return {"status": "ok", "ticket": ticket}
 
 @app.post("/close")
-def close_position(req: CloseRequest):
-    success, message = mt5_handler.close_position(req.ticket)
+async def close_position(req: CloseRequest):
+    success, message = await anyio.to_thread.run_sync(functools.partial(
+        mt5_handler.close_position,
+        req.ticket,
+        symbol=req.symbol,
+        volume=req.volume,
+        pos_type=req.type,
+        max_stale_ms=req.max_stale_ms,
+    ))
     if not success:
         raise HTTPException(status_code=500, detail=f"Failed to close position: {message}")
     return {"status": "ok"}
 
 @app.post("/modify")
-def modify_position(req: ModifyRequest):
-    success, message = mt5_handler.modify_position(
+async def modify_position(req: ModifyRequest):
+    success, message = await anyio.to_thread.run_sync(functools.partial(
+        mt5_handler.modify_position,
         req.ticket,
         req.sl,
         req.tp,
         req.update_sl,
         req.update_tp,
-    )
+    ))
     if not success:
         raise HTTPException(status_code=500, detail=f"Failed to modify position: {message}")
     return {"status": "ok"}
 
+class BatchSubRequest(BaseModel):
+    id: str
+    method: str = "GET"
+    url: str
+    body: Optional[Dict[str, Any]] = None
+
+class BatchRequest(BaseModel):
+    requests: List[BatchSubRequest] = Field(..., max_length=MAX_BATCH_REQUESTS)
+
+async def _dispatch_subrequest(sub: BatchSubRequest) -> Dict[str, Any]:
+    """Run one batch entry through the ASGI app in-process and capture its response."""
+    path, _, query = sub.url.partition("?")
+    if not path.startswith("/"):
+        path = "/" + path
+    # Nested batches would recurse without bound / 入れ子のバッチは無制限に再帰するため拒否
+    if path == "/batch":
+        return {"id": sub.id, "status": 400, "body": {"detail": "Nested batch requests are not allowed"}}
+
+    payload = b"" if sub.body is None else orjson.dumps(sub.body)
+    headers = [(b"content-type", b"application/json")] if payload else []
+    scope: Scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": sub.method.upper(),
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query.encode(),
+        "headers": headers,
+        "client": None,
+        "server": None,
+    }
+
+    # Feed the body once, then report disconnect / ボディを一度だけ渡し、以降は切断を通知
+    body_sent = False
+
+    async def receive() -> Message:
+        nonlocal body_sent
+        if body_sent:
+            return {"type": "http.disconnect"}
+        body_sent = True
+        return {"type": "http.request", "body": payload, "more_body": False}
+
+    # Collect status and body chunks instead of writing to a socket /
+    # ソケットへ書き出す代わりにステータスとボディを収集
+    status = 500
+    chunks: List[bytes] = []
+
+    async def send(message: Message) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    # Go through the full app so HTTPException handlers apply as they do over HTTP /
+    # HTTP経由と同じ例外ハンドラが効くようアプリ全体を通して実行
+    try:
+        await app(scope, receive, send)
+    except Exception:
+        # ServerErrorMiddleware re-raises after sending its 500; keep that failure in this entry
+        # instead of failing the whole batch /
+        # ServerErrorMiddlewareは500送信後に例外を再送出するため、バッチ全体を失敗させずこのエントリに留める
+        logger.exception("Batch sub-request %s %s failed", sub.method.upper(), sub.url)
+        return {"id": sub.id, "status": 500, "body": {"detail": "Internal Server Error"}}
+    raw = b"".join(chunks)
+    try:
+        body: Any = orjson.loads(raw) if raw else None
+    except orjson.JSONDecodeError:
+        body = raw.decode(errors="replace")
+    return {"id": sub.id, "status": status, "body": body}
+
+@app.post("/batch")
+async def batch(req: BatchRequest):
+    # Connect once up front instead of letting every sub-request race to initialize /
+    # サブリクエストごとに初期化を競合させず、最初に一度だけ接続
+    if not mt5_handler.connected:
+        await anyio.to_thread.run_sync(mt5_handler.ensure_connected)
+    # Sub-requests are independent and run concurrently; order of execution is not guaranteed /
+    # サブリクエストは互いに独立して並行実行され、実行順序は保証されない
+    responses = await asyncio.gather(*(_dispatch_subrequest(sub) for sub in req.requests))
+    return {"responses": responses}
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run MT5 Bridge API server")
     parser.add_argument(
@@ -153,7 +372,30 @@ if __name__ == "__main__":
         default=8000,
         help="Port to listen on (default: 8000)",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes, each with its own MT5 connection (default: 1)",
+    )
+    parser.add_argument(
+        "--access-log",
+        action="store_true",
+        help="Enable per-request access logging (default: disabled)",
+    )
     args = parser.parse_args()
 
     # Parse CLI args for server host/port / サーバーのホストとポートをCLI引数から取得
-    uvicorn.run(app, host=args.host, port=args.port)
+    # Use the httptools C parser and uvloop where available ("auto" falls back to asyncio on Windows) /
+    # C実装のhttptoolsパーサーと、利用可能ならuvloopを使用（Windowsでは"auto"がasyncioにフォールバック）
+    # Multiple workers need an import string so each process builds its own app and MT5Handler /
+    # 複数ワーカー時は各プロセスがappとMT5Handlerを個別に生成できるようインポート文字列で渡す
+    uvicorn.run(
+        "mt5_bridge.main:app" if args.workers > 1 else app,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop="auto",
+        http="httptools",
+        access_log=args.access_log,
+    )
@@ -54,6 +54,28 @@ def get_rates(symbol: str, timeframe: str = "M1", count: int = 100) -> List[Dict
     return _request("GET", f"/rates/{symbol}", params={"timeframe": timeframe, "count": count})
 
 
+@mcp.tool()
+def get_rates_range(symbol: str, start: int, end: int, timeframe: str = "M1") -> List[Dict[str, Any]]:
+    """Fetch OHLCV bars within a UNIX-time window / UNIX時刻の範囲内のOHLCVバーを取得"""
+    return _request(
+        "GET",
+        f"/rates/{symbol}/range",
+        params={"timeframe": timeframe, "start": start, "end": end},
+    )
+
+
+@mcp.tool()
+def get_rates_columnar(symbol: str, timeframe: str = "M1", count: int = 100) -> Dict[str, List[Any]]:
+    """Fetch OHLCV bars as one array per field / OHLCVバーを列ごとの配列で取得"""
+    return _request("GET", f"/rates/{symbol}/columns", params={"timeframe": timeframe, "count": count})
+
+
+@mcp.tool()
+def get_rates_multi(symbols: List[str], timeframe: str = "M1", count: int = 100) -> Dict[str, Any]:
+    """Fetch OHLCV bars for several symbols / 複数シンボルのOHLCVバーを取得"""
+    return _request("GET", "/rates", params={"symbols": symbols, "timeframe": timeframe, "count": count})
+
+
 @mcp.tool()
 def get_tick(symbol: str) -> Dict[str, Any]:
     """Fetch latest tick / 最新ティックを取得"""
@@ -81,9 +103,23 @@ def send_order(
 
 
 @mcp.tool()
-def close_position(ticket: int) -> Dict[str, Any]:
-    """Close position by ticket / チケット指定で決済"""
-    return _request("POST", "/close", json={"ticket": ticket})
+def close_position(
+    ticket: int,
+    symbol: Optional[str] = None,
+    volume: Optional[float] = None,
+    position_type: Optional[Literal["BUY", "SELL"]] = None,
+) -> Dict[str, Any]:
+    """
+    Close position by ticket / チケット指定で決済
+
+    symbol, volume and position_type are the existing position's details from list_positions;
+    position_type is the side of the open position, not of the closing deal. Passing all three
+    skips the position lookup. /
+    symbol・volume・position_typeはlist_positionsで得た既存ポジションの情報で、position_typeは
+    決済取引ではなく保有中ポジションの売買方向。3つとも指定するとポジションの問い合わせを省略。
+    """
+    payload = {"ticket": ticket, "symbol": symbol, "volume": volume, "type": position_type}
+    return _request("POST", "/close", json=payload)
 
 
 @mcp.tool()
@@ -99,6 +135,12 @@ def modify_position(
     return _request("POST", "/modify", json=payload)
 
 
+@mcp.tool()
+def batch(requests: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Run several API calls in one round-trip / 複数のAPI呼び出しを1往復で実行"""
+    return _request("POST", "/batch", json={"requests": requests})
+
+
 if __name__ == "__main__":
     import argparse
 
@@ -1,39 +1,454 @@
 import MetaTrader5 as mt5
-import pandas as pd
-from datetime import datetime
+import numpy as np
+import orjson
+import asyncio
 import logging
-from typing import Optional, Dict, List, Union
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from enum import IntEnum
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+from typing import Any, Iterator, NamedTuple, Optional, Dict, List, Union
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Library logger; handlers and levels are configured by the application entry point /
+# ライブラリ用ロガー（ハンドラやレベルの設定はアプリケーションのエントリポイント側で行う）
 logger = logging.getLogger(__name__)
 
+# Field order of the MT5 rate record array / MT5のレート配列のフィールド順
+_RATE_FIELDS = ("time", "open", "high", "low", "close", "tick_volume", "spread", "real_volume")
+
+# dtype of the MT5 rate record array, used to build empty results locally /
+# MT5のレート配列のdtype（空の結果をローカルで生成する際に使用）
+_RATE_DTYPE = np.dtype([
+    ("time", "<i8"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("tick_volume", "<u8"),
+    ("spread", "<i4"),
+    ("real_volume", "<u8"),
+])
+
+# Map timeframe string to MT5 constant, resolved once at import /
+# タイムフレーム文字列からMT5定数への対応表（インポート時に一度だけ構築）
+_TF_MAP = MappingProxyType({
+    "M1": mt5.TIMEFRAME_M1,
+    "M5": mt5.TIMEFRAME_M5,
+    "M15": mt5.TIMEFRAME_M15,
+    "M30": mt5.TIMEFRAME_M30,
+    "H1": mt5.TIMEFRAME_H1,
+    "H4": mt5.TIMEFRAME_H4,
+    "D1": mt5.TIMEFRAME_D1,
+    "W1": getattr(mt5, "TIMEFRAME_W1", None),
+    "MN1": getattr(mt5, "TIMEFRAME_MN1", None),
+})
+
+
+class OrderSide(IntEnum):
+    """
+    Market order side, valued as the matching MT5 ORDER_TYPE_* constant.
+    """
+    BUY = mt5.ORDER_TYPE_BUY
+    SELL = mt5.ORDER_TYPE_SELL
+
+
+def _to_side(value: Union[OrderSide, int, str]) -> Optional[OrderSide]:
+    # Convert "BUY"/"SELL" (any case) or a raw mt5.ORDER_TYPE_* value once at the boundary;
+    # unknown values are rejected rather than silently treated as SELL /
+    # "BUY"/"SELL"（大文字小文字不問）または生のmt5.ORDER_TYPE_*値を入口で一度だけ変換し、
+    # 未知の値はSELL扱いにせず拒否
+    if isinstance(value, int):
+        try:
+            return OrderSide(value)
+        except ValueError:
+            return None
+    return OrderSide.__members__.get(str(value).upper())
+
+
+# Trade request constants, looked up on the mt5 module once / 取引リクエスト用定数（mt5モジュールから一度だけ取得）
+_ACTION_DEAL = mt5.TRADE_ACTION_DEAL
+_ACTION_SLTP = getattr(mt5, "TRADE_ACTION_SLTP", None)
+_TIME_GTC = mt5.ORDER_TIME_GTC
+_RETCODE_DONE = mt5.TRADE_RETCODE_DONE
+_INVALID_FILL_RETCODE = int(getattr(mt5, "TRADE_RETCODE_INVALID_FILL", 10030))
+
+# Filling modes tried in order; None leaves type_filling unset (broker default) /
+# 順に試すfillingモード（Noneはtype_filling未指定＝ブローカー既定）
+_FILLINGS = (
+    None,
+    mt5.ORDER_FILLING_IOC,
+    mt5.ORDER_FILLING_FOK,
+    mt5.ORDER_FILLING_RETURN,
+)
+
+# Fields shared by every market deal request; read-only, merged into a new dict per call /
+# すべての成行リクエストに共通するフィールド（読み取り専用、呼び出しごとに新しいdictへ展開）
+_BASE_DEAL_REQUEST = MappingProxyType({
+    "action": _ACTION_DEAL,
+    "deviation": 20,  # Slippage tolerance
+    "magic": 123456,  # Magic number
+    "type_time": _TIME_GTC,
+})
+
+# Default age up to which a fetched tick may be reused, in milliseconds /
+# 取得済みティックを再利用してよい既定の経過時間（ミリ秒）
+DEFAULT_TICK_MAX_STALE_MS = 50.0
+
+# How long fetched bars may be reused, in nanoseconds (1s, the floor of min(timeframe, 1s)) /
+# 取得済みバーを再利用してよい期間（ナノ秒、min(タイムフレーム, 1秒)=1秒）
+_RATES_CACHE_TTL_NS = 1_000_000_000
+
+# Maximum number of rate cache entries; the oldest fetches are evicted beyond this /
+# レートキャッシュの最大エントリ数（超えた分は取得の古い順に破棄）
+_RATES_CACHE_MAX_ENTRIES = 256
+
+# Upper bound on concurrent MT5 fetches in get_rates_multi; the terminal serializes IPC
+# internally, so more threads mostly add contention /
+# get_rates_multiの同時取得数の上限（ターミナル側でIPCが直列化されるため増やしても競合が増えるだけ）
+_MULTI_FETCH_MAX_WORKERS = 8
+
+# Minimum wait before retrying a failed initialize(), in nanoseconds (500ms) /
+# initialize()失敗後に再試行するまでの最短待機時間（ナノ秒、500ms）
+_INIT_RETRY_INTERVAL_NS = 500_000_000
+
+# Heartbeat probe interval and reconnect backoff ceiling, in seconds /
+# ハートビートの確認間隔と再接続バックオフの上限（秒）
+_HEARTBEAT_INTERVAL = 5.0
+_HEARTBEAT_MAX_BACKOFF = 60.0
+
+# How long a request waits for the heartbeat's reconnect attempt to finish, in seconds /
+# ハートビートによる再接続の試行完了をリクエスト側が待つ最大時間（秒）
+_READY_WAIT_TIMEOUT = 1.0
+
+# How long shutdown waits for the heartbeat thread to exit, in seconds /
+# シャットダウン時にハートビートスレッドの終了を待つ最大時間（秒）
+_HEARTBEAT_JOIN_TIMEOUT = 2.0
+
+def _rates_to_rows(rates: Any) -> List[Dict[str, Any]]:
+    # Convert whole columns to native Python scalars in C, then zip into rows /
+    # 列単位でC実装のtolist()によりPythonネイティブ型へ変換し、行ごとのdictに組み直す
+    # rates is a numpy record array whose fields already carry int/float dtypes /
+    # ratesはint/float型のフィールドを持つnumpyレコード配列なので個別キャストは不要
+    columns = [rates[field].tolist() for field in _RATE_FIELDS]
+    return [dict(zip(_RATE_FIELDS, row)) for row in zip(*columns)]
+
+
+class Tick(NamedTuple):
+    """
+    Latest tick for a symbol. Fixed-size and dict-free; string keys are still
+    accepted (tick["bid"]) for callers written against the old dict return.
+    """
+    time: int
+    bid: float
+    ask: float
+    last: float
+    volume: int
+
+    def __getitem__(self, key: Union[str, int, slice]) -> Any:  # type: ignore[override]
+        # Field-name access for dict-style callers, positional access otherwise /
+        # dict形式の呼び出し側向けにフィールド名でのアクセスを許し、それ以外はタプルとして扱う
+        if isinstance(key, str):
+            return getattr(self, key)
+        return tuple.__getitem__(self, key)
+
+
 class MT5Handler:
-    def __init__(self):
+    def __init__(self) -> None:
         self.connected = False
+        # Per-symbol tick cache: symbol -> (monotonic_ns, raw MT5 tick) /
+        # シンボルごとのティックキャッシュ: シンボル -> (取得時刻monotonic_ns, MT5の生ティック)
+        self._tick_cache: Dict[str, tuple[int, Any]] = {}
+        # Rate cache in fetch order: (symbol, timeframe, num_bars) -> (monotonic_ns, rate record array) /
+        # 取得順のレートキャッシュ: (シンボル, タイムフレーム, 本数) -> (取得時刻monotonic_ns, レート配列)
+        self._rates_cache: "OrderedDict[tuple[str, str, int], tuple[int, Any]]" = OrderedDict()
+        # Guards inserts and evictions; request threads and get_rates_multi workers share the cache /
+        # 挿入と破棄を保護（リクエストスレッドとget_rates_multiのワーカーがキャッシュを共有するため）
+        self._rates_cache_lock = threading.Lock()
+        # Serializes (re)initialization across request threads and the heartbeat; reentrant because
+        # ensure_connected holds it while calling initialize() /
+        # リクエストスレッドとハートビート間で(再)初期化を直列化（ensure_connectedが保持したまま
+        # initialize()を呼ぶため再入可能ロック）
+        self._init_lock = threading.RLock()
+        # monotonic_ns of the last failed initialize(), 0 if none / 直近のinitialize()失敗時刻（なければ0）
+        self._last_init_fail_ns = 0
+        # Bumped and notified after every heartbeat round, success or failure, so waiting requests
+        # learn the outcome as soon as an attempt ends /
+        # ハートビートの各周回の後に成否を問わず加算・通知し、待機中のリクエストへ試行結果を即座に伝える
+        self._attempt_cond = threading.Condition()
+        self._attempt_seq = 0
+        # MT5 calls in flight on request threads, and whether a reconnect is waiting for them to drain;
+        # lets the heartbeat's mt5.shutdown() never run underneath e.g. an order_send /
+        # リクエストスレッドで実行中のMT5呼び出し数と、再接続がその完了を待っているか
+        # （ハートビートのmt5.shutdown()がorder_send等の実行中に走らないようにする）
+        self._call_cond = threading.Condition()
+        self._calls_in_flight = 0
+        self._reconnect_pending = False
+        self._heartbeat_stop = threading.Event()
+        # Set by requests (and stop_heartbeat) to cut the heartbeat's current wait short /
+        # リクエスト（およびstop_heartbeat）がセットし、ハートビートの待機を打ち切る
+        self._heartbeat_wake = threading.Event()
+        self._heartbeat_thread: Optional[threading.Thread] = None
 
     def initialize(self) -> bool:
         """
         Initialize connection to MetaTrader 5 terminal.
         """
-        if not mt5.initialize():
-            logger.error("initialize() failed, error code = %s", mt5.last_error())
-            self.connected = False
-            return False
-        
-        logger.info("MT5 initialized successfully")
-        self.connected = True
-        return True
+        with self._init_lock:
+            if not mt5.initialize():
+                logger.error("initialize() failed, error code = %s", mt5.last_error())
+                self.connected = False
+                return False
+
+            logger.info("MT5 initialized successfully")
+            self.connected = True
+            return True
+
+    def ensure_connected(self) -> bool:
+        """
+        Connect on demand, letting only one thread run initialize() at a time.
+        """
+        # Fast path: no locking once connected / 接続済みならロック不要
+        if self.connected:
+            return True
+        # With the heartbeat running, reconnecting is its job: wake it past its backoff and wait
+        # for the attempt to finish instead of running initialize() on the request path /
+        # ハートビート稼働中は再接続をそちらに任せ、バックオフ中でも起こしたうえで
+        # リクエスト側ではinitialize()せず試行の完了を待つ
+        if self._heartbeat_running():
+            # Fail fast right after a failed attempt, as without the heartbeat /
+            # ハートビートなしの場合と同様、失敗直後は待たずに即座に失敗を返す
+            if time.monotonic_ns() - self._last_init_fail_ns < _INIT_RETRY_INTERVAL_NS:
+                return False
+            with self._attempt_cond:
+                seq = self._attempt_seq
+                self._heartbeat_wake.set()
+                self._attempt_cond.wait_for(
+                    lambda: self.connected or self._attempt_seq != seq, _READY_WAIT_TIMEOUT
+                )
+            return self.connected
+        with self._init_lock:
+            # Another thread may have reconnected while we waited / 待機中に別スレッドが再接続済みの場合
+            if self.connected:
+                return True
+            # Do not hammer a broken terminal on every request / 壊れたターミナルへリクエストごとに再接続しない
+            if time.monotonic_ns() - self._last_init_fail_ns < _INIT_RETRY_INTERVAL_NS:
+                return False
+            if not self.initialize():
+                self._last_init_fail_ns = time.monotonic_ns()
+                return False
+            return True
+
+    @contextmanager
+    def _mt5_call(self) -> Iterator[None]:
+        # Shared side of the reconnect guard: wraps one request-path MT5 call; never nest /
+        # 再接続ガードの共有側（リクエスト側のMT5呼び出し1回を囲む。入れ子にしないこと）
+        with self._call_cond:
+            while self._reconnect_pending:
+                self._call_cond.wait()
+            self._calls_in_flight += 1
+        try:
+            yield
+        finally:
+            with self._call_cond:
+                self._calls_in_flight -= 1
+                if self._calls_in_flight == 0:
+                    self._call_cond.notify_all()
+
+    @contextmanager
+    def _exclusive_reconnect(self) -> Iterator[None]:
+        # Exclusive side: hold off new MT5 calls and wait for those in flight to finish /
+        # 排他側（新たなMT5呼び出しを止め、実行中の呼び出しの完了を待つ）
+        with self._call_cond:
+            self._reconnect_pending = True
+            while self._calls_in_flight:
+                self._call_cond.wait()
+        try:
+            yield
+        finally:
+            with self._call_cond:
+                self._reconnect_pending = False
+                self._call_cond.notify_all()
+
+    def _heartbeat_running(self) -> bool:
+        thread = self._heartbeat_thread
+        return thread is not None and thread.is_alive() and not self._heartbeat_stop.is_set()
+
+    def start_heartbeat(self, interval: float = _HEARTBEAT_INTERVAL) -> None:
+        """
+        Start a daemon thread that probes the terminal and reconnects in the background.
+        """
+        thread = self._heartbeat_thread
+        if thread is not None and thread.is_alive():
+            if not self._heartbeat_stop.is_set():
+                return
+            # A previous stop timed out; never run two heartbeats side by side /
+            # 前回の停止がタイムアウトした場合、ハートビートを二重に動かさない
+            thread.join(_HEARTBEAT_JOIN_TIMEOUT)
+            if thread.is_alive():
+                logger.warning("MT5 heartbeat is still stopping; not starting another")
+                return
+        self._heartbeat_stop.clear()
+        self._heartbeat_wake.clear()
+        self._heartbeat_thread = threading.Thread(
+            target=self._heartbeat, args=(interval,), name="mt5-heartbeat", daemon=True
+        )
+        self._heartbeat_thread.start()
 
-    def shutdown(self):
+    def stop_heartbeat(self) -> None:
+        """
+        Stop the heartbeat thread, if running.
+        """
+        thread = self._heartbeat_thread
+        if thread is None:
+            return
+        self._heartbeat_stop.set()
+        self._heartbeat_wake.set()
+        if thread is not threading.current_thread():
+            # Bounded: the thread may be stuck inside a slow mt5.initialize(); it is a daemon /
+            # 上限付き（遅いmt5.initialize()の途中の可能性があるため。デーモンスレッドなので放置可）
+            thread.join(_HEARTBEAT_JOIN_TIMEOUT)
+            if thread.is_alive():
+                # Keep the reference so start_heartbeat() can tell it is still running /
+                # start_heartbeat()が稼働中と判断できるよう参照を残す
+                logger.warning("MT5 heartbeat did not stop within %.1fs", _HEARTBEAT_JOIN_TIMEOUT)
+                return
+        self._heartbeat_thread = None
+
+    def _heartbeat(self, interval: float) -> None:
+        # Probe with a cheap terminal_info() call; reconnect with exponential backoff on failure.
+        # A request waking the thread skips the rest of the backoff /
+        # 軽量なterminal_info()で死活確認し、失敗時は指数バックオフで再接続
+        # （リクエストに起こされた場合は残りのバックオフを省略）
+        delay = 0.0 if not self.connected else interval
+        while not self._heartbeat_stop.is_set():
+            self._heartbeat_wake.wait(delay)
+            self._heartbeat_wake.clear()
+            if self._heartbeat_stop.is_set():
+                return
+            if self.connected and mt5.terminal_info() is not None:
+                delay = interval
+            else:
+                if self.connected:
+                    logger.warning("MT5 heartbeat failed; reconnecting")
+                self.connected = False
+                with self._init_lock, self._exclusive_reconnect():
+                    mt5.shutdown()
+                    ok = self.initialize()
+                    if not ok:
+                        self._last_init_fail_ns = time.monotonic_ns()
+                    # shutdown() may have run while initialize() was stuck; do not leave a live
+                    # connection behind it /
+                    # initialize()が長引く間にshutdown()が走った場合、接続を残さない
+                    elif self._heartbeat_stop.is_set():
+                        mt5.shutdown()
+                        self.connected = False
+                # Requests that woke us during this attempt are answered below /
+                # この試行中に起こしたリクエストには下記の通知で結果が伝わる
+                self._heartbeat_wake.clear()
+                delay = interval if ok else min(max(delay, interval) * 2, _HEARTBEAT_MAX_BACKOFF)
+
+            # Wake requests waiting on this round, whatever its outcome /
+            # 成否を問わず、この周回を待っているリクエストを起こす
+            with self._attempt_cond:
+                self._attempt_seq += 1
+                self._attempt_cond.notify_all()
+
+    def shutdown(self) -> None:
         """
         Shutdown connection to MetaTrader 5.
         """
-        mt5.shutdown()
-        self.connected = False
+        # Stop the heartbeat first so it does not reconnect behind our back /
+        # 裏で再接続されないよう先にハートビートを停止
+        self.stop_heartbeat()
+        # A heartbeat still stuck in initialize() holds the lock; skip it rather than wait, since that
+        # thread undoes its own connection once it sees the stop flag /
+        # initialize()で止まったままのハートビートはロックを保持しているため待たずに進む
+        # （そのスレッドは停止フラグを見て自ら接続を破棄する）
+        locked = self._init_lock.acquire(blocking=self._heartbeat_thread is None)
+        try:
+            mt5.shutdown()
+            self.connected = False
+        finally:
+            if locked:
+                self._init_lock.release()
         logger.info("MT5 connection shutdown")
 
-    def get_rates(self, symbol: str, timeframe_str: str, num_bars: int) -> Optional[List[Dict]]:
+    def _fetch_rates_raw(self, symbol: str, timeframe_str: str, num_bars: int, use_cache: bool = True) -> Optional[Any]:
+        """
+        Fetch the latest bars as the numpy record array returned by MT5, or None if failed.
+        """
+        # Reject bad input before touching the connection / 接続処理の前に不正な入力を弾く
+        mt5_tf = _TF_MAP.get(timeframe_str)
+        if mt5_tf is None:
+            logger.error("Invalid timeframe: %s", timeframe_str)
+            return None
+        if num_bars <= 0:
+            return np.empty(0, dtype=_RATE_DTYPE)
+
+        # Pollers asking for the same bars within 1s share one MT5 round-trip /
+        # 1秒以内に同じバーを要求するポーリングは1回のMT5呼び出しを共有
+        key = (symbol, timeframe_str, num_bars)
+        if use_cache:
+            # A single get() is atomic under the GIL, so hits stay lock-free / 単一のget()はGIL下でアトミックなのでヒット時はロック不要
+            fetched_ns, cached = self._rates_cache.get(key, (0, None))
+            if cached is not None and time.monotonic_ns() - fetched_ns < _RATES_CACHE_TTL_NS:
+                return cached
+
+        if not self.ensure_connected():
+            return None
+
+        # Copy rates from current time backwards
+        with self._mt5_call():
+            rates = mt5.copy_rates_from_pos(symbol, mt5_tf, 0, num_bars)
+        
+        if rates is None:
+            logger.error("Failed to get rates for %s", symbol)
+            return None
+
+        # Keep arbitrary (symbol, count) combinations from growing the cache without bound;
+        # the oldest fetch is also the first to expire, so evict from the front /
+        # 任意の(シンボル, 本数)の組み合わせでキャッシュが際限なく増えないよう、
+        # 最も早く期限切れになる取得の古い順に先頭から破棄
+        with self._rates_cache_lock:
+            self._rates_cache[key] = (time.monotonic_ns(), rates)
+            self._rates_cache.move_to_end(key)
+            while len(self._rates_cache) > _RATES_CACHE_MAX_ENTRIES:
+                self._rates_cache.popitem(last=False)
+        return rates
+
+    def get_rates_ndarray(
+        self, symbol: str, timeframe_str: str, num_bars: int, use_cache: bool = True
+    ) -> Optional[np.ndarray]:
+        """
+        Get historical rates as the numpy structured array returned by MT5.
+
+        The dtype fields are time, open, high, low, close, tick_volume, spread
+        and real_volume, in ascending time order. The array may be shared with
+        the rates cache, so it is returned read-only.
+
+        Args:
+            symbol: Symbol name (e.g., "XAUUSD")
+            timeframe_str: Timeframe string (e.g., "M1", "H1")
+            num_bars: Number of bars to fetch
+            use_cache: Reuse bars fetched within the last second instead of querying MT5 again.
+
+        Returns:
+            Structured ndarray of rates, or None if failed.
+        """
+        rates = self._fetch_rates_raw(symbol, timeframe_str, num_bars, use_cache)
+        if rates is None:
+            return None
+
+        # Read-only view so callers cannot corrupt cached bars / キャッシュ中のバーを書き換えられないよう読み取り専用ビューで返す
+        view: np.ndarray = rates.view()
+        view.flags.writeable = False
+        return view
+
+    def get_rates(self, symbol: str, timeframe_str: str, num_bars: int, use_cache: bool = True) -> Optional[List[Dict[str, Any]]]:
         """
         Get historical rates for a symbol.
         
@@ -41,86 +456,181 @@ class MT5Handler:
             symbol: Symbol name (e.g., "XAUUSD")
             timeframe_str: Timeframe string (e.g., "M1", "H1")
             num_bars: Number of bars to fetch
+            use_cache: Reuse bars fetched within the last second instead of querying MT5 again.
             
         Returns:
             List of dictionaries containing rate data, or None if failed.
         """
-        if not self.connected:
-            if not self.initialize():
-                return None
-
-        # Map timeframe string to MT5 constant
-        tf_map = {
-            "M1": mt5.TIMEFRAME_M1,
-            "M5": mt5.TIMEFRAME_M5,
-            "M15": mt5.TIMEFRAME_M15,
-            "M30": mt5.TIMEFRAME_M30,
-            "H1": mt5.TIMEFRAME_H1,
-            "H4": mt5.TIMEFRAME_H4,
-            "D1": mt5.TIMEFRAME_D1,
-            "W1": getattr(mt5, "TIMEFRAME_W1", None),
-            "MN1": getattr(mt5, "TIMEFRAME_MN1", None),
-        }
-        
-        mt5_tf = tf_map.get(timeframe_str)
+        rates = self._fetch_rates_raw(symbol, timeframe_str, num_bars, use_cache)
+        if rates is None:
+            return None
+        return _rates_to_rows(rates)
+
+    def get_rates_range(
+        self, symbol: str, timeframe_str: str, start: datetime, end: datetime
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get the bars of a symbol that open within a time window.
+
+        Args:
+            symbol: Symbol name (e.g., "XAUUSD")
+            timeframe_str: Timeframe string (e.g., "M1", "H1")
+            start: Window start; naive datetimes are taken as UTC.
+            end: Window end (inclusive); naive datetimes are taken as UTC.
+
+        Returns:
+            List of dictionaries containing rate data, or None if failed.
+        """
+        mt5_tf = _TF_MAP.get(timeframe_str)
         if mt5_tf is None:
-            logger.error(f"Invalid timeframe: {timeframe_str}")
+            logger.error("Invalid timeframe: %s", timeframe_str)
             return None
 
-        # Copy rates from current time backwards
-        rates = mt5.copy_rates_from_pos(symbol, mt5_tf, 0, num_bars)
-        
+        # MT5 interprets datetimes as UTC / MT5は日時をUTCとして解釈する
+        if start.tzinfo is None:
+            start = start.replace(tzinfo=timezone.utc)
+        if end.tzinfo is None:
+            end = end.replace(tzinfo=timezone.utc)
+        if start >= end:
+            logger.error("Invalid range for %s: start %s is not before end %s", symbol, start, end)
+            return None
+
+        if not self.ensure_connected():
+            return None
+
+        # Let the terminal filter by time so only the requested window crosses IPC /
+        # 時間での絞り込みをターミナル側で行い、要求範囲のバーだけをIPCで受け取る
+        with self._mt5_call():
+            rates = mt5.copy_rates_range(symbol, mt5_tf, start, end)
         if rates is None:
-            logger.error(f"Failed to get rates for {symbol}")
+            logger.error("Failed to get rates for %s", symbol)
             return None
-            
-        # Convert to list of dicts (handling numpy types)
-        # rates is a numpy record array
-        result = []
-        for rate in rates:
-            result.append({
-                "time": int(rate['time']),
-                "open": float(rate['open']),
-                "high": float(rate['high']),
-                "low": float(rate['low']),
-                "close": float(rate['close']),
-                "tick_volume": int(rate['tick_volume']),
-                "spread": int(rate['spread']),
-                "real_volume": int(rate['real_volume'])
-            })
-            
-        return result
+        return _rates_to_rows(rates)
 
-    def get_tick(self, symbol: str) -> Optional[Dict]:
+    def get_rates_multi(
+        self, symbols: List[str], timeframe_str: str, num_bars: int, use_cache: bool = True
+    ) -> Optional[Dict[str, Optional[List[Dict[str, Any]]]]]:
         """
-        Get latest tick data.
+        Get historical rates for several symbols concurrently.
+
+        Args:
+            symbols: Symbol names (e.g., ["XAUUSD", "EURUSD"])
+            timeframe_str: Timeframe string (e.g., "M1", "H1")
+            num_bars: Number of bars to fetch per symbol
+            use_cache: Reuse bars fetched within the last second instead of querying MT5 again.
+
+        Returns:
+            Dictionary mapping each symbol to its get_rates result (None for symbols that failed),
+            or None if the timeframe is invalid.
         """
-        if not self.connected:
-            if not self.initialize():
-                return None
+        # A bad timeframe fails every symbol alike; reject it once instead of per symbol /
+        # 不正なタイムフレームは全シンボルで失敗するため、シンボルごとではなく一度だけ弾く
+        if _TF_MAP.get(timeframe_str) is None:
+            logger.error("Invalid timeframe: %s", timeframe_str)
+            return None
+        unique_symbols = list(dict.fromkeys(symbols))
+        if not unique_symbols:
+            return {}
+
+        # Overlap the per-symbol IPC round-trips; MT5 releases the GIL while waiting /
+        # シンボルごとのIPC往復を重ねる（待機中はMT5がGILを解放する）
+        with ThreadPoolExecutor(max_workers=min(len(unique_symbols), _MULTI_FETCH_MAX_WORKERS)) as executor:
+            results = executor.map(
+                lambda symbol: self.get_rates(symbol, timeframe_str, num_bars, use_cache),
+                unique_symbols,
+            )
+            return dict(zip(unique_symbols, results))
+
+    def get_rates_columnar(self, symbol: str, timeframe_str: str, num_bars: int, use_cache: bool = True) -> Optional[Dict[str, List[Any]]]:
+        """
+        Get historical rates as one list per field instead of one dict per bar.
+
+        Args:
+            symbol: Symbol name (e.g., "XAUUSD")
+            timeframe_str: Timeframe string (e.g., "M1", "H1")
+            num_bars: Number of bars to fetch
+            use_cache: Reuse bars fetched within the last second instead of querying MT5 again.
+
+        Returns:
+            Dictionary mapping each rate field to its column of values, or None if failed.
+        """
+        rates = self._fetch_rates_raw(symbol, timeframe_str, num_bars, use_cache)
+        if rates is None:
+            return None
+
+        # One tolist() per column; no per-bar Python objects / 列ごとに1回のtolist()のみで、バー単位のオブジェクトを作らない
+        return {field: rates[field].tolist() for field in _RATE_FIELDS}
+
+    def get_rates_columnar_json(self, symbol: str, timeframe_str: str, num_bars: int, use_cache: bool = True) -> Optional[bytes]:
+        """
+        Get historical rates in the get_rates_columnar layout, already encoded as JSON bytes.
+
+        Args:
+            symbol: Symbol name (e.g., "XAUUSD")
+            timeframe_str: Timeframe string (e.g., "M1", "H1")
+            num_bars: Number of bars to fetch
+            use_cache: Reuse bars fetched within the last second instead of querying MT5 again.
+
+        Returns:
+            UTF-8 JSON document, or None if failed.
+        """
+        rates = self._fetch_rates_raw(symbol, timeframe_str, num_bars, use_cache)
+        if rates is None:
+            return None
+
+        # orjson reads numeric ndarrays through the buffer protocol, so no Python scalars are boxed;
+        # record-array fields are strided views and must be made contiguous first /
+        # orjsonは数値ndarrayをバッファプロトコルで直接読むためPythonスカラーを生成しない。
+        # レコード配列のフィールドはストライド付きビューなので先に連続配列へ変換する
+        columns = {field: np.ascontiguousarray(rates[field]) for field in _RATE_FIELDS}
+        return orjson.dumps(columns, option=orjson.OPT_SERIALIZE_NUMPY)
+
+    def _symbol_tick(self, symbol: str, max_stale_ms: float = DEFAULT_TICK_MAX_STALE_MS) -> Optional[Any]:
+        """
+        Fetch the raw MT5 tick struct for a symbol, or None if failed.
+        """
+        # Serve bursts (e.g. consecutive orders on one symbol) from the cache /
+        # 同一シンボルへの連続発注などのバーストはキャッシュから返す
+        if max_stale_ms > 0:
+            fetched_ns, cached = self._tick_cache.get(symbol, (0, None))
+            if cached is not None and time.monotonic_ns() - fetched_ns < max_stale_ms * 1_000_000:
+                return cached
+
+        if not self.ensure_connected():
+            return None
                 
-        tick = mt5.symbol_info_tick(symbol)
+        with self._mt5_call():
+            tick = mt5.symbol_info_tick(symbol)
         if tick is None:
-            logger.error(f"Failed to get tick for {symbol}")
+            logger.error("Failed to get tick for %s", symbol)
             return None
-            
-        return {
-            "time": int(tick.time),
-            "bid": float(tick.bid),
-            "ask": float(tick.ask),
-            "last": float(tick.last),
-            "volume": int(tick.volume)
-        }
 
-    def get_positions(self) -> Optional[List[Dict]]:
+        self._tick_cache[symbol] = (time.monotonic_ns(), tick)
+        return tick
+
+    def get_tick(self, symbol: str, max_stale_ms: float = DEFAULT_TICK_MAX_STALE_MS) -> Optional[Tick]:
+        """
+        Get latest tick data.
+
+        Args:
+            symbol: Symbol name (e.g., "XAUUSD")
+            max_stale_ms: Reuse a tick fetched within this many milliseconds; 0 always queries MT5.
+        """
+        tick = self._symbol_tick(symbol, max_stale_ms)
+        if tick is None:
+            return None
+
+        return Tick(int(tick.time), float(tick.bid), float(tick.ask), float(tick.last), int(tick.volume))
+
+    def get_positions(self) -> Optional[List[Dict[str, Any]]]:
         """
         Get current open positions.
         """
-        if not self.connected:
-            if not self.initialize():
-                return None
+        if not self.ensure_connected():
+            return None
                 
-        positions = mt5.positions_get()
+        with self._mt5_call():
+            positions = mt5.positions_get()
         if positions is None:
             return []
             
@@ -129,7 +639,7 @@ class MT5Handler:
             result.append({
                 "ticket": int(pos.ticket),
                 "symbol": pos.symbol,
-                "type": "BUY" if pos.type == mt5.ORDER_TYPE_BUY else "SELL",
+                "type": "BUY" if pos.type == OrderSide.BUY else "SELL",
                 "volume": float(pos.volume),
                 "price_open": float(pos.price_open),
                 # deep-trader 側で「自分のポジだけ」を安全に識別するために必要
@@ -147,157 +657,168 @@ class MT5Handler:
     def send_order(
         self,
         symbol: str,
-        order_type: str,
+        order_type: Union[OrderSide, int, str],
         volume: float,
         sl: float = 0.0,
         tp: float = 0.0,
         comment: str = "",
+        max_stale_ms: float = DEFAULT_TICK_MAX_STALE_MS,
     ) -> tuple[Optional[int], Optional[str]]:
         """
         Send a market order.
         
         Args:
             symbol: Symbol to trade.
-            order_type: "BUY" or "SELL".
+            order_type: OrderSide, an mt5.ORDER_TYPE_BUY / ORDER_TYPE_SELL value, or "BUY" / "SELL".
             volume: Lot size.
             sl: Stop Loss price.
             tp: Take Profit price.
             comment: Order comment.
+            max_stale_ms: Maximum age of a cached tick used for pricing; 0 always queries MT5.
             
         Returns:
             Order ticket if successful, None otherwise.
         """
-        if not self.connected:
-            if not self.initialize():
-                message = "MT5 に接続できませんでした"
-                return None, message
+        side = _to_side(order_type)
+        if side is None:
+            message = f"Invalid order type: {order_type}"
+            logger.error(message)
+            return None, message
+
+        if not self.ensure_connected():
+            message = "MT5 に接続できませんでした"
+            return None, message
                 
-        # Get current price for filling request
-        tick = self.get_tick(symbol)
+        # Get current price for filling request; read it straight off the MT5 struct /
+        # 約定価格用に現在値を取得（dict化せずMT5の構造体から直接参照）
+        tick = self._symbol_tick(symbol, max_stale_ms)
         if tick is None:
             message = f"{symbol} のティック情報を取得できません"
             logger.error(message)
             return None, message
             
-        action = mt5.TRADE_ACTION_DEAL
-        mt5_type = mt5.ORDER_TYPE_BUY if order_type == "BUY" else mt5.ORDER_TYPE_SELL
-        price = tick['ask'] if order_type == "BUY" else tick['bid']
-        
         base_request = {
-            "action": action,
+            **_BASE_DEAL_REQUEST,
             "symbol": symbol,
             "volume": volume,
-            "type": mt5_type,
-            "price": price,
+            "type": side.value,
+            "price": tick.ask if side is OrderSide.BUY else tick.bid,
             "sl": sl,
             "tp": tp,
-            "deviation": 20,  # Slippage tolerance
-            "magic": 123456,  # Magic number
             "comment": comment,
-            "type_time": mt5.ORDER_TIME_GTC,
         }
 
         # filling の切り替えは「filling 起因の失敗」のときだけ行う。
         # 例: Invalid stops(10016) は filling を変えても解決しないので、総当たりしない。
-        invalid_fill_retcode = getattr(mt5, "TRADE_RETCODE_INVALID_FILL", 10030)
-
         # まずはデフォルト（type_filling未指定）を試し、
         # 「Unsupported filling mode / Invalid filling」等の場合のみ filling を変えて再試行する。
-        fillings = [
-            None,
-            mt5.ORDER_FILLING_IOC,
-            mt5.ORDER_FILLING_FOK,
-            mt5.ORDER_FILLING_RETURN,
-        ]
         last_error: Optional[str] = None
-        for filling in fillings:
+        for filling in _FILLINGS:
             request = dict(base_request)
             if filling is not None:
                 request["type_filling"] = filling
             filling_label = "default" if filling is None else str(filling)
-            result = mt5.order_send(request)
+            with self._mt5_call():
+                result = mt5.order_send(request)
             if result is None:
                 # result=None は通信/端末側の問題の可能性が高く、filling を変えても改善しないことが多い
                 last_error = f"order_send returned None with filling={filling_label}"
                 logger.error(last_error)
                 break
-            if result.retcode == mt5.TRADE_RETCODE_DONE:
-                logger.info(f"Order sent successfully: {result.order} (filling={filling_label})")
+            if result.retcode == _RETCODE_DONE:
+                logger.info("Order sent successfully: %s (filling=%s)", result.order, filling_label)
                 return result.order, None
             last_error = f"filling={filling_label} {result.retcode} で失敗: {result.comment}"
             logger.warning("Order send failed: %s", last_error)
 
             # filling 起因の失敗（Unsupported/Invalid filling）のときだけ次の filling を試す。
             # それ以外（例: Invalid stops）は即座に中断して返す。
-            if int(result.retcode) == int(invalid_fill_retcode) or "filling" in str(result.comment).lower():
+            if int(result.retcode) == _INVALID_FILL_RETCODE or "filling" in str(result.comment).lower():
                 continue
             break
         message = last_error or "すべての filling モードで発注に失敗しました"
         return None, message
 
-    def close_position(self, ticket: int) -> tuple[bool, str]:
+    def close_position(
+        self,
+        ticket: int,
+        *,
+        symbol: Optional[str] = None,
+        volume: Optional[float] = None,
+        pos_type: Union[OrderSide, int, str, None] = None,
+        max_stale_ms: float = DEFAULT_TICK_MAX_STALE_MS,
+    ) -> tuple[bool, str]:
         """
         Close an existing position.
+
+        Args:
+            ticket: Position ticket.
+            symbol: Position symbol, as reported by get_positions.
+            volume: Volume to close.
+            pos_type: Position side, as OrderSide, an mt5.ORDER_TYPE_* value or "BUY" / "SELL".
+            max_stale_ms: Maximum age of a cached tick used for pricing; 0 always queries MT5.
+
+        When symbol, volume and pos_type are all given (e.g. straight from a
+        get_positions scan), the positions_get lookup is skipped.
+
         Returns: (success, message)
         """
-        if not self.connected:
-            if not self.initialize():
-                return False, "Failed to connect to MT5"
-                
-        # Get position details to know volume and symbol
-        positions = mt5.positions_get(ticket=ticket)
-        if positions is None or len(positions) == 0:
-            logger.error(f"Position {ticket} not found")
-            return False, f"Position {ticket} not found"
-            
-        pos = positions[0]
-        symbol = pos.symbol
-        volume = pos.volume
+        pos_side = None
+        if pos_type is not None:
+            pos_side = _to_side(pos_type)
+            if pos_side is None:
+                return False, f"Invalid position type: {pos_type}"
+
+        if not self.ensure_connected():
+            return False, "Failed to connect to MT5"
+
+        # Skip the lookup when the caller already knows the position; saves one MT5 round-trip /
+        # 呼び出し側がポジション情報を持っていれば問い合わせを省略（MT5との往復を1回削減）
+        if symbol is None or volume is None or pos_side is None:
+            # Get position details to know volume and symbol
+            with self._mt5_call():
+                positions = mt5.positions_get(ticket=ticket)
+            if positions is None or len(positions) == 0:
+                logger.error("Position %s not found", ticket)
+                return False, f"Position {ticket} not found"
+
+            pos = positions[0]
+            symbol = pos.symbol
+            volume = pos.volume
+            pos_side = OrderSide(pos.type)
         
         # Determine opposite type
-        order_type = mt5.ORDER_TYPE_SELL if pos.type == mt5.ORDER_TYPE_BUY else mt5.ORDER_TYPE_BUY
+        close_side = OrderSide.SELL if pos_side is OrderSide.BUY else OrderSide.BUY
         
-        # Get current price
-        tick = self.get_tick(symbol)
+        # Get current price / 現在値を取得
+        tick = self._symbol_tick(symbol, max_stale_ms)
         if tick is None:
             return False, f"Failed to get tick for {symbol}"
             
-        price = tick['bid'] if order_type == mt5.ORDER_TYPE_SELL else tick['ask']
-        
         base_request = {
-            "action": mt5.TRADE_ACTION_DEAL,
+            **_BASE_DEAL_REQUEST,
             "symbol": symbol,
             "volume": volume,
-            "type": order_type,
+            "type": close_side.value,
             "position": ticket,
-            "price": price,
-            "deviation": 20,
-            "magic": 123456,
+            "price": tick.bid if close_side is OrderSide.SELL else tick.ask,
             "comment": "Close position",
-            "type_time": mt5.ORDER_TIME_GTC,
         }
 
         # filling の切り替えは「filling 起因の失敗」のときだけ行う。
-        invalid_fill_retcode = getattr(mt5, "TRADE_RETCODE_INVALID_FILL", 10030)
-
-        fillings = [
-            None,
-            mt5.ORDER_FILLING_IOC,
-            mt5.ORDER_FILLING_FOK,
-            mt5.ORDER_FILLING_RETURN,
-        ]
         last_error: Optional[str] = None
-        for filling in fillings:
+        for filling in _FILLINGS:
             request = dict(base_request)
             if filling is not None:
                 request["type_filling"] = filling
             filling_label = "default" if filling is None else str(filling)
-            result = mt5.order_send(request)
+            with self._mt5_call():
+                result = mt5.order_send(request)
             if result is None:
                 last_error = f"order_send returned None with filling={filling_label}"
                 logger.error(last_error)
                 break
-            if result.retcode == mt5.TRADE_RETCODE_DONE:
+            if result.retcode == _RETCODE_DONE:
                 logger.info("Position %s closed successfully (filling=%s)", ticket, filling_label)
                 return True, "Success"
             last_error = f"filling={filling_label} {result.retcode} で失敗: {result.comment}"
@@ -305,7 +826,7 @@ class MT5Handler:
 
             # filling 起因の失敗（Unsupported/Invalid filling）のときだけ次の filling を試す。
             # それ以外（例: Invalid stops）は即座に中断して返す。
-            if int(result.retcode) == int(invalid_fill_retcode) or "filling" in str(result.comment).lower():
+            if int(result.retcode) == _INVALID_FILL_RETCODE or "filling" in str(result.comment).lower():
                 continue
             break
 
@@ -318,19 +839,18 @@ class MT5Handler:
         if not update_sl and not update_tp:
             return False, "Nothing to update"
 
-        if not self.connected:
-            if not self.initialize():
-                return False, "Failed to connect to MT5"
+        if not self.ensure_connected():
+            return False, "Failed to connect to MT5"
 
-        positions = mt5.positions_get(ticket=ticket)
+        with self._mt5_call():
+            positions = mt5.positions_get(ticket=ticket)
         if positions is None or len(positions) == 0:
-            logger.error(f"Position {ticket} not found")
+            logger.error("Position %s not found", ticket)
             return False, f"Position {ticket} not found"
 
         pos = positions[0]
         symbol = pos.symbol
-        action = getattr(mt5, "TRADE_ACTION_SLTP", None)
-        if action is None:
+        if _ACTION_SLTP is None:
             logger.error("MT5 does not support TRADE_ACTION_SLTP")
             return False, "TRADE_ACTION_SLTP not available"
 
@@ -344,22 +864,59 @@ class MT5Handler:
             tp_value = 0.0 if tp is None else float(tp)
 
         request = {
-            "action": action,
+            "action": _ACTION_SLTP,
             "position": ticket,
             "symbol": symbol,
             "sl": sl_value,
             "tp": tp_value,
         }
 
-        result = mt5.order_send(request)
+        with self._mt5_call():
+            result = mt5.order_send(request)
         if result is None:
             logger.error("Modify position failed: result is None")
             return False, "order_send returned None"
 
-        if result.retcode != mt5.TRADE_RETCODE_DONE:
+        if result.retcode != _RETCODE_DONE:
             error_msg = f"{result.comment} ({result.retcode})"
-            logger.error(f"Modify position failed: {error_msg}")
+            logger.error("Modify position failed: %s", error_msg)
             return False, error_msg
 
-        logger.info(f"Protection updated for ticket {ticket}")
+        logger.info("Protection updated for ticket %s", ticket)
         return True, "Success"
+
+    # Coroutine wrappers: run the blocking MT5 call in a worker thread so an event loop stays responsive /
+    # コルーチン版: ブロッキングするMT5呼び出しをワーカースレッドで実行し、イベントループを止めない
+    async def aget_rates(
+        self, symbol: str, timeframe_str: str, num_bars: int, use_cache: bool = True
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Async version of get_rates.
+        """
+        return await asyncio.to_thread(self.get_rates, symbol, timeframe_str, num_bars, use_cache)
+
+    async def aget_tick(self, symbol: str, max_stale_ms: float = DEFAULT_TICK_MAX_STALE_MS) -> Optional[Tick]:
+        """
+        Async version of get_tick.
+        """
+        return await asyncio.to_thread(self.get_tick, symbol, max_stale_ms)
+
+    async def asend_order(
+        self,
+        symbol: str,
+        order_type: Union[OrderSide, int, str],
+        volume: float,
+        sl: float = 0.0,
+        tp: float = 0.0,
+        comment: str = "",
+        max_stale_ms: float = DEFAULT_TICK_MAX_STALE_MS,
+    ) -> tuple[Optional[int], Optional[str]]:
+        """
+        Async version of send_order.
+
+        The MT5 binding serializes calls internally, so concurrent awaits overlap
+        with other work on the loop rather than with each other.
+        """
+        return await asyncio.to_thread(
+            self.send_order, symbol, order_type, volume, sl, tp, comment, max_stale_ms
+        )